@@ -7,137 +7,197 @@ order includes a transaction UUID for payment integration and a
 status column to track its lifecycle (INITIATED, COMPLETED, FAILED).
 """
 
+import os
+import queue
 import sqlite3
+import time
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "db.sqlite"
 
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Per-connection tuning. journal_mode=WAL persists in the database file, so it
+# is set once in init_db(); these have to be applied to every new connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=134217728",
+)
+
+
+def _is_memory_db() -> bool:
+    return str(DB_PATH) == ":memory:"
+
+
+# Connections are reused across requests so SQLite's page cache stays warm.
+# Idle connections beyond POOL_SIZE are closed rather than pooled.
+POOL_SIZE = min(32, (os.cpu_count() or 1) * 4)
+_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=POOL_SIZE)
+
+
+def _connect() -> sqlite3.Connection:
+    # isolation_level=None disables sqlite3's implicit transactions; helpers
+    # that issue several writes group them with an explicit BEGIN/COMMIT.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+@contextmanager
+def get_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a connection from the pool and return it when done."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        # Never hand a connection with an open transaction to the next caller.
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+# The product list changes only through the admin CRUD helpers below, which
+# bump PRODUCTS_VER. The TTL bounds staleness when another process writes.
+PRODUCTS_CACHE_TTL = 60.0
+PRODUCTS_VER = 0
+_products_cache = {"ver": -1, "expires": 0.0, "rows": None}
+
+
+def _invalidate_products() -> None:
+    global PRODUCTS_VER
+    PRODUCTS_VER += 1
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    image_url TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_uuid TEXT NOT NULL UNIQUE,
+    customer_name TEXT NOT NULL,
+    customer_email TEXT,
+    customer_phone TEXT,
+    customer_address TEXT,
+    amount REAL NOT NULL,
+    tax_amount REAL NOT NULL,
+    service_charge REAL NOT NULL,
+    delivery_charge REAL NOT NULL,
+    total_amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL,
+    FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE,
+    FOREIGN KEY(product_id) REFERENCES products(id)
+);
+
+-- The admin order listing sorts by creation time. The order_items index is
+-- for per-order item lookups; nothing queries it yet, and foreign keys are
+-- not enforced (PRAGMA foreign_keys is off), so it does not speed up the
+-- ON DELETE CASCADE.
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+"""
+
+
 def init_db() -> None:
     """Create the database schema and seed with initial products."""
-    conn = get_connection()
-    cur = conn.cursor()
-    # Products table
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            price REAL NOT NULL,
-            image_url TEXT NOT NULL
-        )
-        """
-    )
-    # Orders table
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_uuid TEXT NOT NULL UNIQUE,
-            customer_name TEXT NOT NULL,
-            customer_email TEXT,
-            customer_phone TEXT,
-            customer_address TEXT,
-            amount REAL NOT NULL,
-            tax_amount REAL NOT NULL,
-            service_charge REAL NOT NULL,
-            delivery_charge REAL NOT NULL,
-            total_amount REAL NOT NULL,
-            status TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    )
-    # Order items table
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            price REAL NOT NULL,
-            FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE,
-            FOREIGN KEY(product_id) REFERENCES products(id)
-        )
-        """
-    )
-    # Seed products if empty
-    count = cur.execute("SELECT COUNT(*) FROM products").fetchone()[0]
-    if count == 0:
-        products = [
-            ("Classic Aviator Sunglasses", "Timeless aviator frames with UV400 protection and mirrored lenses.", 59.99, "/static/images/aviator.png"),
-            ("Retro Round Sunglasses", "Vintage-inspired round sunglasses with polarized lenses.", 45.50, "/static/images/retro.png"),
-            ("Sporty Wraparound Shades", "Durable wraparound sunglasses designed for outdoor sports.", 39.00, "/static/images/sporty.png"),
-            ("Lucky Purchase", "Try your luck! Mystery sunglasses at an amazing price.", 1.00, "/static/images/lucky.png"),
-        ]
-        cur.executemany(
-            "INSERT INTO products (name, description, price, image_url) VALUES (?,?,?,?)",
-            products,
-        )
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        # WAL lets readers proceed while a write is in progress; not supported
+        # for in-memory databases.
+        if not _is_memory_db():
+            cur.execute("PRAGMA journal_mode=WAL")
+        # Schema creation and seeding happen in one transaction. executescript
+        # commits any pending transaction first, so BEGIN is part of the script.
+        cur.executescript("BEGIN IMMEDIATE;" + SCHEMA_SQL)
+        # Seed products if empty
+        count = cur.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        if count == 0:
+            products = [
+                ("Classic Aviator Sunglasses", "Timeless aviator frames with UV400 protection and mirrored lenses.", 59.99, "/static/images/aviator.png"),
+                ("Retro Round Sunglasses", "Vintage-inspired round sunglasses with polarized lenses.", 45.50, "/static/images/retro.png"),
+                ("Sporty Wraparound Shades", "Durable wraparound sunglasses designed for outdoor sports.", 39.00, "/static/images/sporty.png"),
+                ("Lucky Purchase", "Try your luck! Mystery sunglasses at an amazing price.", 1.00, "/static/images/lucky.png"),
+            ]
+            cur.executemany(
+                "INSERT INTO products (name, description, price, image_url) VALUES (?,?,?,?)",
+                products,
+            )
+        cur.execute("COMMIT")
+    _invalidate_products()
 
 
 def get_products() -> List[Dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    rows = cur.execute("SELECT id, name, description, price, image_url FROM products").fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    """Return all products. The list is cached and must not be mutated."""
+    ver = PRODUCTS_VER
+    if _products_cache["ver"] == ver and _products_cache["expires"] > time.monotonic():
+        return _products_cache["rows"]
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id, name, description, price, image_url FROM products").fetchall()
+    products = [dict(row) for row in rows]
+    _products_cache.update(ver=ver, expires=time.monotonic() + PRODUCTS_CACHE_TTL, rows=products)
+    return products
 
 
 def get_product(product_id: int) -> Dict:
-    conn = get_connection()
-    cur = conn.cursor()
-    row = cur.execute(
-        "SELECT id, name, description, price, image_url FROM products WHERE id = ?",
-        (product_id,),
-    ).fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT id, name, description, price, image_url FROM products WHERE id = ?",
+            (product_id,),
+        ).fetchone()
     return dict(row) if row else None
 
 
-def create_product(name: str, description: str, price: float, image_url: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO products (name, description, price, image_url) VALUES (?,?,?,?)",
-        (name, description, price, image_url),
-    )
-    product_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return product_id
-
+def upsert_product(
+    product_id: Optional[int], name: str, description: str, price: float, image_url: str
+) -> Optional[int]:
+    """Create a product (``product_id`` is ``None``) or update an existing one.
 
-def update_product(product_id: int, name: str, description: str, price: float, image_url: str) -> None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE products SET name=?, description=?, price=?, image_url=? WHERE id = ?",
-        (name, description, price, image_url, product_id),
-    )
-    conn.commit()
-    conn.close()
+    An id that no longer exists, e.g. a product deleted while its edit form
+    was open, is left alone rather than re-inserted; ``None`` is returned.
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            "INSERT INTO products (id, name, description, price, image_url) "
+            "SELECT ?1, ?2, ?3, ?4, ?5 WHERE ?1 IS NULL OR EXISTS (SELECT 1 FROM products WHERE id = ?1) "
+            "ON CONFLICT(id) DO UPDATE SET name=excluded.name, description=excluded.description, "
+            "price=excluded.price, image_url=excluded.image_url RETURNING id",
+            (product_id, name, description, price, image_url),
+        ).fetchone()
+    _invalidate_products()
+    return row["id"] if row else None
 
 
 def delete_product(product_id: int) -> None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE id = ?", (product_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+    _invalidate_products()
 
 
 def create_order(
@@ -150,92 +210,98 @@ def create_order(
     service_charge: float,
     delivery_charge: float,
 ) -> Dict:
-    """Create an order and return its row as a dict."""
-    conn = get_connection()
-    cur = conn.cursor()
-    # Compute subtotal
-    amount = 0.0
+    """Create an order and return its row as a dict.
+
+    Only ``id`` and ``created_at`` are read back from the database; the other
+    columns come from the values that were inserted.
+    """
+    tax_amount = float(tax_amount)
+    service_charge = float(service_charge)
+    delivery_charge = float(delivery_charge)
+    # Normalise product ids so they match the integer keys SQLite returns
+    # (e.g. "1" from a JSON client).
+    items = []
     for item in cart:
         pid = item.get("productId")
-        qty = item.get("quantity", 1)
-        row = cur.execute("SELECT price FROM products WHERE id = ?", (pid,)).fetchone()
-        if row is None:
-            conn.close()
+        try:
+            items.append((int(pid), item.get("quantity", 1)))
+        except (TypeError, ValueError):
             raise ValueError(f"Product {pid} not found")
-        amount += row["price"] * qty
-    amount = round(amount, 2)
-    total_amount = round(amount + tax_amount + service_charge + delivery_charge, 2)
-    transaction_uuid = str(uuid.uuid4())
-    # Insert into orders
-    cur.execute(
-        "INSERT INTO orders (transaction_uuid, customer_name, customer_email, customer_phone, customer_address, amount, tax_amount, service_charge, delivery_charge, total_amount, status) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
-        (
-            transaction_uuid,
-            customer_name,
-            customer_email,
-            customer_phone,
-            customer_address,
-            amount,
-            tax_amount,
-            service_charge,
-            delivery_charge,
-            total_amount,
-            "INITIATED",
-        ),
-    )
-    order_id = cur.lastrowid
-    # Insert order items
-    for item in cart:
-        pid = item.get("productId")
-        qty = item.get("quantity", 1)
-        price_row = cur.execute("SELECT price FROM products WHERE id = ?", (pid,)).fetchone()
-        price = price_row["price"]
-        cur.execute(
+    with get_connection() as conn:
+        cur = conn.cursor()
+        # Take the write lock up front so concurrent checkouts wait on the
+        # busy timeout instead of failing on a read-to-write lock upgrade.
+        cur.execute("BEGIN IMMEDIATE")
+        # Fetch the price of every product in the cart with one query
+        pids = [pid for pid, _ in items]
+        placeholders = ",".join("?" * len(pids))
+        prices = dict(
+            cur.execute(f"SELECT id, price FROM products WHERE id IN ({placeholders})", pids).fetchall()
+        )
+        for pid in pids:
+            if pid not in prices:
+                cur.execute("ROLLBACK")
+                raise ValueError(f"Product {pid} not found")
+        # Compute subtotal
+        amount = round(sum(prices[pid] * qty for pid, qty in items), 2)
+        total_amount = round(amount + tax_amount + service_charge + delivery_charge, 2)
+        transaction_uuid = str(uuid.uuid4())
+        order = {
+            "transaction_uuid": transaction_uuid,
+            "customer_name": customer_name,
+            "customer_email": customer_email,
+            "customer_phone": customer_phone,
+            "customer_address": customer_address,
+            "amount": float(amount),
+            "tax_amount": tax_amount,
+            "service_charge": service_charge,
+            "delivery_charge": delivery_charge,
+            "total_amount": float(total_amount),
+            "status": "INITIATED",
+        }
+        # Insert into orders, reading back only the generated columns. RETURNING
+        # yields values before column affinity is applied (a REAL 1.0 comes back
+        # as 1), so the rest of the row is taken from the values inserted.
+        returned = cur.execute(
+            "INSERT INTO orders (transaction_uuid, customer_name, customer_email, customer_phone, customer_address, amount, tax_amount, service_charge, delivery_charge, total_amount, status) VALUES (?,?,?,?,?,?,?,?,?,?,?) RETURNING id, created_at",
+            tuple(order.values()),
+        ).fetchone()
+        order_id = returned["id"]
+        # Insert order items, reusing the prices fetched above
+        cur.executemany(
             "INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?,?,?,?)",
-            (order_id, pid, qty, price),
+            [(order_id, pid, qty, prices[pid]) for pid, qty in items],
         )
-    conn.commit()
-    # Retrieve inserted order with transaction_uuid
-    order_row = cur.execute(
-        "SELECT * FROM orders WHERE id = ?",
-        (order_id,),
-    ).fetchone()
-    conn.close()
-    return dict(order_row)
+        cur.execute("COMMIT")
+    return {"id": order_id, **order, "created_at": returned["created_at"]}
 
 
 def get_order_by_id(order_id: int) -> Dict:
-    conn = get_connection()
-    cur = conn.cursor()
-    row = cur.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
     return dict(row) if row else None
 
 
 def get_order_by_uuid(transaction_uuid: str) -> Dict:
-    conn = get_connection()
-    cur = conn.cursor()
-    row = cur.execute("SELECT * FROM orders WHERE transaction_uuid = ?", (transaction_uuid,)).fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM orders WHERE transaction_uuid = ?", (transaction_uuid,)).fetchone()
     return dict(row) if row else None
 
 
 def update_order_status(transaction_uuid: str, status: str) -> None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE orders SET status = ? WHERE transaction_uuid = ?",
-        (status, transaction_uuid),
-    )
-    conn.commit()
-    conn.close()
-
-
-def get_orders() -> List[Dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    rows = cur.execute(
-        "SELECT * FROM orders ORDER BY created_at DESC"
-    ).fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
\ No newline at end of file
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE orders SET status = ? WHERE transaction_uuid = ?",
+            (status, transaction_uuid),
+        )
+
+
+def get_order_rows() -> List[sqlite3.Row]:
+    """Return all orders, newest first, as ``sqlite3.Row`` objects.
+
+    Rows support key access, so templates can use them without a dict copy.
+    """
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT * FROM orders ORDER BY created_at DESC"
+        ).fetchall()
@@ -8,27 +8,34 @@ Jinja2 for server‑side rendering.
 """
 
 import os
+import asyncio
 import base64
-import json
 import hmac
 import hashlib
+import jinja2
+import orjson
+from binascii import b2a_base64
 from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import FileResponse, RedirectResponse, HTMLResponse, JSONResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from typing import Optional
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
 
 import database
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Mount static assets (CSS, JS, images)
 app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
 
-# Jinja2 templates location
+# Jinja2 templates location. Compiled templates are cached as bytecode in a
+# per-user temp directory so restarted workers skip the parser.
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+templates.env.bytecode_cache = jinja2.FileSystemBytecodeCache()
+ADMIN_TEMPLATES = ("admin_dashboard.html", "admin_products.html", "admin_orders.html")
 
 # eSewa configuration
 PORT = int(os.environ.get("PORT", 8000))
@@ -39,71 +46,126 @@ ESEWA_FORM_URL = os.environ.get(
     "ESEWA_FORM_URL", "https://rc-epay.esewa.com.np/api/epay/main/v2/form"
 )
 
+# The key is fixed for the process lifetime, so derive the keyed HMAC state
+# once and copy it for each signature.
+_HMAC_TEMPLATE = hmac.new(ESEWA_SECRET_KEY.encode(), b"", hashlib.sha256)
+_PRODUCT_CODE_FIELD = b"product_code=" + ESEWA_PRODUCT_CODE.encode()
+_PRODUCT_CODE_SUFFIX = b"," + _PRODUCT_CODE_FIELD
+
+
+# Static HTML pages served from memory, keyed by filename: (body, ETag).
+# Loaded at import so the pages don't depend on the startup hook having run.
+STATIC_PAGES = ("index.html", "cart.html", "checkout.html", "success.html", "failure.html")
+
+
+def _load_page(name: str) -> Tuple[bytes, str]:
+    with open(os.path.join(BASE_DIR, "templates", name), "rb") as f:
+        body = f.read()
+    return body, f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+
+
+_PAGES = {name: _load_page(name) for name in STATIC_PAGES}
+
 
 @app.on_event("startup")
 def startup() -> None:
-    """Initialise the database when the server starts."""
+    """Initialise the database and compile the admin templates."""
     database.init_db()
+    for name in ADMIN_TEMPLATES:
+        templates.get_template(name)
 
 
-def html_response(filename: str) -> FileResponse:
-    path = os.path.join(BASE_DIR, "templates", filename)
-    return FileResponse(path, media_type="text/html")
+def html_response(request: Request, filename: str) -> Response:
+    body, etag = _PAGES[filename]
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if_none_match = request.headers.get("if-none-match")
+    # "*" matches any current representation, and these pages always exist.
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/html", headers=headers)
 
 
 @app.get("/")
-def index() -> FileResponse:
-    return html_response("index.html")
+def index(request: Request) -> Response:
+    return html_response(request, "index.html")
 
 
 @app.get("/cart.html")
-def cart_page() -> FileResponse:
-    return html_response("cart.html")
+def cart_page(request: Request) -> Response:
+    return html_response(request, "cart.html")
 
 
 @app.get("/checkout.html")
-def checkout_page() -> FileResponse:
-    return html_response("checkout.html")
+def checkout_page(request: Request) -> Response:
+    return html_response(request, "checkout.html")
 
 
 @app.get("/success.html")
-def success_page() -> FileResponse:
-    return html_response("success.html")
+def success_page(request: Request) -> Response:
+    return html_response(request, "success.html")
 
 
 @app.get("/failure.html")
-def failure_page() -> FileResponse:
-    return html_response("failure.html")
+def failure_page(request: Request) -> Response:
+    return html_response(request, "failure.html")
+
+
+# Serialised body of the last product list returned by database.get_products().
+# That list is only replaced when the product cache is refreshed, so its
+# identity tells us whether the encoded body is still current.
+_products_body = {"products": None, "body": b""}
 
 
 # API endpoints
+#
+# Plain ``def`` endpoints are run in FastAPI's threadpool already; the
+# ``async def`` ones hand their blocking database calls to a worker thread
+# so SQLite I/O doesn't stall the event loop.
 @app.get("/api/products")
-def api_products() -> dict:
-    return {"products": database.get_products()}
+def api_products() -> Response:
+    products = database.get_products()
+    if _products_body["products"] is not products:
+        body = orjson.dumps({"products": products})
+        _products_body.update(products=products, body=body)
+    return Response(content=_products_body["body"], media_type="application/json")
+
+
+class CartItem(BaseModel):
+    productId: int
+    quantity: int = 1
+
+
+class OrderIn(BaseModel):
+    """Request body for ``POST /api/order``; invalid bodies get a 422."""
+
+    customerName: str
+    customerEmail: str
+    customerPhone: str
+    customerAddress: str
+    cart: List[CartItem]
+    tax_amount: float
+    service_charge: float
+    delivery_charge: float
 
 
 @app.post("/api/order")
-async def api_create_order(request: Request) -> JSONResponse:
-    try:
-        data = await request.json()
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON body")
-    required = ["customerName", "customerEmail", "customerPhone", "customerAddress", "cart", "tax_amount", "service_charge", "delivery_charge"]
-    for field in required:
-        if field not in data:
-            raise HTTPException(status_code=400, detail=f"Missing field {field}")
+async def api_create_order(data: OrderIn) -> dict:
     try:
-        order = database.create_order(
-            customer_name=data["customerName"],
-            customer_email=data["customerEmail"],
-            customer_phone=data["customerPhone"],
-            customer_address=data["customerAddress"],
-            cart=data["cart"],
-            tax_amount=float(data["tax_amount"]),
-            service_charge=float(data["service_charge"]),
-            delivery_charge=float(data["delivery_charge"]),
+        order = await asyncio.to_thread(
+            database.create_order,
+            customer_name=data.customerName,
+            customer_email=data.customerEmail,
+            customer_phone=data.customerPhone,
+            customer_address=data.customerAddress,
+            cart=[dict(item) for item in data.cart],
+            tax_amount=data.tax_amount,
+            service_charge=data.service_charge,
+            delivery_charge=data.delivery_charge,
         )
-        return JSONResponse({"orderId": order["id"]})
+        return {"orderId": order["id"]}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -112,21 +174,31 @@ async def api_create_order(request: Request) -> JSONResponse:
 
 def generate_signature(total_amount: str, transaction_uuid: str) -> str:
     """Generate HMAC SHA256 signature for eSewa form fields."""
-    data_string = f"total_amount={total_amount},transaction_uuid={transaction_uuid},product_code={ESEWA_PRODUCT_CODE}"
-    digest = hmac.new(ESEWA_SECRET_KEY.encode(), data_string.encode(), hashlib.sha256).digest()
-    return base64.b64encode(digest).decode()
+    h = _HMAC_TEMPLATE.copy()
+    h.update(
+        b"".join(
+            (
+                b"total_amount=",
+                total_amount.encode(),
+                b",transaction_uuid=",
+                transaction_uuid.encode(),
+                _PRODUCT_CODE_SUFFIX,
+            )
+        )
+    )
+    return b2a_base64(h.digest(), newline=False).decode("ascii")
 
 
 @app.post("/api/initiate-payment")
-async def api_initiate_payment(request: Request) -> JSONResponse:
+async def api_initiate_payment(request: Request) -> dict:
     try:
-        data = await request.json()
-    except Exception:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON body")
     order_id = data.get("orderId")
     if not order_id:
         raise HTTPException(status_code=400, detail="Missing orderId")
-    order = database.get_order_by_id(int(order_id))
+    order = await asyncio.to_thread(database.get_order_by_id, int(order_id))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     # Generate signature using total_amount (formatted with two decimals) and transaction_uuid
@@ -144,7 +216,7 @@ async def api_initiate_payment(request: Request) -> JSONResponse:
         "signed_field_names": "total_amount,transaction_uuid,product_code",
         "signature": signature,
     }
-    return JSONResponse({"formData": form_data, "gatewayUrl": ESEWA_FORM_URL})
+    return {"formData": form_data, "gatewayUrl": ESEWA_FORM_URL}
 
 
 @app.get("/esewa-callback")
@@ -157,24 +229,28 @@ async def esewa_callback(request: Request) -> RedirectResponse:
     if not encoded_data:
         return RedirectResponse(url="/failure.html")
     try:
-        decoded_json = base64.b64decode(encoded_data).decode()
-        payload = json.loads(decoded_json)
+        payload = orjson.loads(base64.b64decode(encoded_data))
         received_sig = payload.get("signature")
-        verify_string = (
-            f"transaction_code={payload.get('transaction_code')},"
-            f"status={payload.get('status')},"
-            f"total_amount={payload.get('total_amount')},"
-            f"transaction_uuid={payload.get('transaction_uuid')},"
-            f"product_code={ESEWA_PRODUCT_CODE},"
-            f"signed_field_names={payload.get('signed_field_names')}"
+        # total_amount may arrive as a JSON number, so it is formatted via str()
+        verify_bytes = b",".join(
+            (
+                b"transaction_code=" + payload["transaction_code"].encode(),
+                b"status=" + payload["status"].encode(),
+                b"total_amount=" + str(payload["total_amount"]).encode(),
+                b"transaction_uuid=" + payload["transaction_uuid"].encode(),
+                _PRODUCT_CODE_FIELD,
+                b"signed_field_names=" + payload["signed_field_names"].encode(),
+            )
         )
-        computed_sig = base64.b64encode(
-            hmac.new(ESEWA_SECRET_KEY.encode(), verify_string.encode(), hashlib.sha256).digest()
-        ).decode()
-        # Verify signature and status
-        if computed_sig == received_sig and payload.get("status") == "COMPLETE":
+        h = _HMAC_TEMPLATE.copy()
+        h.update(verify_bytes)
+        received_digest = base64.b64decode(received_sig, validate=True)
+        # Verify signature (constant-time, on raw digests) and status
+        if hmac.compare_digest(h.digest(), received_digest) and payload.get("status") == "COMPLETE":
             # Update order status
-            database.update_order_status(payload.get("transaction_uuid"), "COMPLETED")
+            await asyncio.to_thread(
+                database.update_order_status, payload.get("transaction_uuid"), "COMPLETED"
+            )
             return RedirectResponse(url="/success.html")
     except Exception:
         pass
@@ -221,10 +297,7 @@ def admin_save_product(
         # If required fields missing, just redirect back
         return RedirectResponse(url="/admin/products", status_code=303)
     try:
-        if id:
-            database.update_product(int(id), name, description, float(price), image_url)
-        else:
-            database.create_product(name, description, float(price), image_url)
+        database.upsert_product(int(id) if id else None, name, description, float(price), image_url)
     except Exception:
         pass
     return RedirectResponse(url="/admin/products", status_code=303)
@@ -232,7 +305,7 @@ def admin_save_product(
 
 @app.get("/admin/orders")
 def admin_orders(request: Request) -> HTMLResponse:
-    orders = database.get_orders()
+    orders = database.get_order_rows()
     return templates.TemplateResponse(
         "admin_orders.html",
         {"request": request, "orders": orders},